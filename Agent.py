@@ -1,20 +1,137 @@
-from code_documentation_generator import CodeDocumentationGenerator
-from CodeGuard import CodeGuard
+import os
+
+from azure.ai.projects import AIProjectClient
+from azure.identity import DefaultAzureCredential
+
+from code_documentation_generator import CodeDocumentationGenerator, _DOC_EXTS, _DOC_SPECIAL
+from CodeGuard import CodeGuard, _CODE_EXTENSIONS
+from env_cache import _env
+from inventory import load_inventory
 from ppt_generation import PPTGenerator
 
-def main():
-    # Method 1: Using environment variables from a .env file
-    print("Runnin Agent: Code Documentation Generator")
-    generator = CodeDocumentationGenerator(env_file=".env")
-    generator.generate_documentation()
+## The combined run feeds both tasks, so its filter is the union of the
+## guard's code extensions and the documentation collector's set; the
+## docs keep their markdown/text/Dockerfile inputs this way
+_COMBINED_EXTS = _CODE_EXTENSIONS | _DOC_EXTS
+
+## One prompt covering both the security review and the documentation
+## tasks; the code is uploaded once and the agent replies with a single
+## JSON envelope that each class's write_outputs consumes.
+_COMBINED_PROMPT = """You are an AI agent performing two tasks on the provided code files.
+
+Task 1 - Security review (CodeGuard):
+Scan the code for potential data leaks, exposed or hard-coded credentials, and
+unauthorized external connections. Allowed services: any Azure service and any
+locally deployed endpoint. Anything else is disallowed. For each issue report a
+description, the service used and a brief about it, its inputs and outputs, the
+type of data sent, the file name, full path and line number, and a recommended
+resolution.
+
+Task 2 - Documentation:
+Analyze the same code and write technical documentation and business
+documentation, both as markdown.
+
+Return your findings as ONE valid JSON object in the following strict format:
+
+{
+  "risks": {
+    "issues": [
+      {
+        "description": "<description of the issue>",
+        "inputs": "<inputs to the service>",
+        "outputs": "<outputs from the service>",
+        "data_type": "<type of data being sent>",
+        "file_name": "<name of the file>",
+        "file_path": "<full path to the file>",
+        "line_number": "<line number>",
+        "service_name": "<name of the service>",
+        "service_brief": "<brief description of the service>",
+        "resolution": "<recommended resolution>"
+      }
+    ]
+  },
+  "technical": "<technical documentation markdown>",
+  "business": "<business documentation markdown>"
+}
+
+Reply only in the JSON format. Do not include any additional text.
 
-    print("Running Agent: Code Guard")
-    code_guard = CodeGuard()
-    code_guard.run()
+Code to review and document (lines are numbered):
+"""
 
+def _read_combined_code(directory):
+    """Format the cached inventory for the combined prompt.
+
+    Files are filtered with the union of both agents' filters and lines
+    are numbered in the guard's format, so the security review can cite
+    line numbers while the documentation still sees the markdown, text
+    and Dockerfile inputs its own collector would include.
+    """
+    parts = ["*** Code Files:\n"]
+    found = 0
+    for relpath, text in load_inventory(directory):
+        file = os.path.basename(relpath)
+        if os.path.splitext(file)[1] not in _COMBINED_EXTS and file not in _DOC_SPECIAL:
+            continue
+        found += 1
+        numbered = "\n".join(
+            f"{i} {line}" for i, line in enumerate(text.splitlines(), start=1)
+        )
+        parts.append(
+            f"** File Name: {file}\n"
+            f"** File Path: {os.path.join(directory, relpath)}\n"
+            f"** Content:\n{numbered}\n\n"
+        )
+    if not found:
+        return ""
+    return "".join(parts)
+
+def run_combined_analysis(project_client):
+    """Run the security review and documentation as one agent call."""
+    print("Running Agents: Code Guard + Code Documentation Generator (combined run)")
+    generator = CodeDocumentationGenerator(env_file=".env", project_client=project_client)
+    code_guard = CodeGuard(project_client=project_client)
+
+    ## One formatting pass over the shared inventory covers the union of
+    ## both tasks' inputs, so the codebase is uploaded exactly once
+    code_content = _read_combined_code(code_guard.code_directory)
+    if not code_content:
+        print("⚠️ No code files found.")
+        return False
+
+    response = generator.run_prompt(_COMBINED_PROMPT + code_content)
+    if not response:
+        return False
+
+    saved_docs = generator.write_outputs(response)
+    saved_risks = code_guard.write_outputs(response.get("risks") or {})
+    return saved_docs and saved_risks
+
+def run_ppt_generator(project_client):
     print("Running Agent: PPT Generator")
-    ppt_generator = PPTGenerator(env_file=".env")
-    ppt_generator.run()
+    ppt_generator = PPTGenerator(env_file=".env", project_client=project_client)
+    return ppt_generator.run()
+
+def main():
+    ## Build one credential and one client and share them across the
+    ## agents, so the credential chain walk, token acquisition, and TLS
+    ## handshake are paid once. The interactive probes are excluded so
+    ## the chain walk never stalls on a browser or IDE prompt.
+    credential = DefaultAzureCredential(
+        exclude_interactive_browser_credential=True,
+        exclude_visual_studio_code_credential=True,
+    )
+    project_client = AIProjectClient.from_connection_string(
+        credential=credential,
+        conn_str=_env()["CONN_STR"],
+    )
+
+    ## The review and documentation prompts are batched into a single
+    ## billable run; the PPT pipeline stays separate because it needs a
+    ## file upload plus a code-interpreter agent, and it consumes the
+    ## documentation produced above.
+    run_combined_analysis(project_client)
+    run_ppt_generator(project_client)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,28 +1,50 @@
 ## Import necessary libraries
 import os
-import time
 from azure.ai.projects import AIProjectClient
+from azure.ai.projects.models import MessageDeltaChunk
 from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
 import json
 import re
 from collections import defaultdict
 
-## Load environment variables from .env file
-load_dotenv()
+from agent_cache import cache_agent_id, drop_cached_agent_id, get_cached_agent_id
+from env_cache import _env
+from inventory import load_inventory
+
+## File extensions CodeGuard scans for review
+_CODE_EXTENSIONS = frozenset({'.py', '.js', '.java', '.cpp', '.c', '.html', '.yaml'})
+
+## Compiled once at import; re.search would otherwise recompile per run
+_JSON_BLOCK_RE = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+_MARKER_RE = re.compile(r"your json response here:", re.IGNORECASE)
+
+## Shared decoder; raw_decode parses a single object from an offset and
+## stops at the balancing brace, so surrounding prose is ignored
+_JSON_DECODER = json.JSONDecoder()
 
 ## Convert the file into a class
 class CodeGuard:
-    def __init__(self, conn_str=None, agent_name=None):
-        self.conn_str = os.getenv("CONN_STR")
-        self.agent_name = os.getenv("GUARD_AGENT_NAME")
-        self.code_directory = os.getenv("CODE_DIRECTORY")
-        self.output_dir = os.getenv("OUTPUT_DIR")
+    def __init__(self, conn_str=None, agent_name=None, project_client=None):
+        ## _env() parses the .env file once and serves cached lookups
+        env = _env()
+        self.conn_str = env["CONN_STR"]
+        self.agent_name = env["GUARD_AGENT_NAME"]
+        self.code_directory = env["CODE_DIRECTORY"]
+        self.output_dir = env["OUTPUT_DIR"]
+        ## Optional shared client injected by the caller (see Agent.main)
+        self.project_client = project_client
 
     def initialize_client(self):
+        ## Reuse an injected client so credential chain walks and TLS
+        ## handshakes are paid once across the agents
+        if self.project_client is not None:
+            return self.project_client
         try:
             project_client = AIProjectClient.from_connection_string(
-                credential=DefaultAzureCredential(),
+                credential=DefaultAzureCredential(
+                    exclude_interactive_browser_credential=True,
+                    exclude_visual_studio_code_credential=True,
+                ),
                 conn_str=self.conn_str,
             )
             return project_client
@@ -32,10 +54,19 @@ class CodeGuard:
         
     ## Get the agent by name
     def get_agent(self, project_client, agent_name):
+        ## A cached id turns the O(N) list_agents scan into a single GET
+        cached_id = get_cached_agent_id(self.conn_str, agent_name)
+        if cached_id:
+            try:
+                return project_client.agents.get_agent(cached_id)
+            except Exception:
+                ## Stale id (agent deleted/recreated); fall back to listing
+                drop_cached_agent_id(self.conn_str, agent_name)
         try:
             agents = project_client.agents.list_agents()
             for existing_agent in agents.data:
                 if existing_agent.name == agent_name:
+                    cache_agent_id(self.conn_str, agent_name, existing_agent.id)
                     return existing_agent
             print(f"❌ Agent '{agent_name}' not found.")
             return None
@@ -65,38 +96,40 @@ class CodeGuard:
             print(f"❌ Error sending message to agent: {e}")
             return None
     
-    ## Read code from directory and print the count of each file type
+    ## Format the shared inventory and print the count of each file type
     def read_code_from_directory(self, directory):
         file_types_count = defaultdict(int)
         code_files = []
-        prompt_content = "*** Code Files:\n"
+        ## Collect chunks in a list and join once at the end; appending to a
+        ## growing string is quadratic in the total content size
+        parts = ["*** Code Files:\n"]
 
+        print(f"🔍 Searching in directory: {directory}")
         try:
-            for root, dirs, files in os.walk(directory):
-                print(f"🔍 Searching in directory: {directory}")
-                for file in files:
-                    file_extension = os.path.splitext(file)[1]
-                    if file_extension in ['.py', '.js', '.java', '.cpp', '.c', '.html', '.yaml']:
-                        full_path = os.path.join(root, file)
-                        code_files.append(os.path.join(root, file))
-                        file_types_count[file_extension] += 1
-                        with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content_lines = f.readlines()
-
-                        content_lines = "".join(
-                            f"{i + 1} {line}" for i, line in enumerate(content_lines)
-                        )
-                        prompt_content += (
-                            f"** File Name: {file}\n"
-                            f"** File Path: {full_path}\n"
-                            f"** Content:\n{content_lines}\n\n"
-                        )     
+            ## load_inventory walks and reads the tree once per process;
+            ## this method only filters and formats the cached entries
+            for relpath, text in load_inventory(directory):
+                file_extension = os.path.splitext(relpath)[1]
+                if file_extension not in _CODE_EXTENSIONS:
+                    continue
+                full_path = os.path.join(directory, relpath)
+                code_files.append(full_path)
+                file_types_count[file_extension] += 1
+
+                numbered = "\n".join(
+                    f"{i} {line}" for i, line in enumerate(text.splitlines(), start=1)
+                )
+                parts.append(
+                    f"** File Name: {os.path.basename(relpath)}\n"
+                    f"** File Path: {full_path}\n"
+                    f"** Content:\n{numbered}\n\n"
+                )
             print(f"✅ Found {len(code_files)} code files.")
             for file_type, count in file_types_count.items():
                 print(f"File type '{file_type}': {count} files")
         except Exception as e:
             print(f"❌ Error reading code from directory: {e}")
-        return prompt_content
+        return "".join(parts)
 
     def run(self):
         project_client = self.initialize_client()
@@ -176,61 +209,73 @@ class CodeGuard:
             print(f"❌ Error sending message: {e}")
             return None
 
+        ## Stream the run so response tokens are consumed as they are
+        ## produced, instead of blocking on the full run and re-downloading
+        ## the whole thread with list_messages afterwards
         try:
-            run = project_client.agents.create_and_process_run(
+            chunks = []
+            with project_client.agents.create_stream(
                 thread_id=thread.id,
                 agent_id=agent.id
-            )
-            print("✅ Agent run started.")
-        except Exception as e:
-            print(f"❌ Error processing run: {e}")
-            return None
-
-        time.sleep(0.5)
-
-        ## Retrieve the agent's response
-        try:
-            response = project_client.agents.list_messages(thread_id=thread.id)
-            print("✅ Messages retrieved.")
+            ) as stream:
+                for event_type, event_data, _ in stream:
+                    if isinstance(event_data, MessageDeltaChunk):
+                        chunks.append(event_data.text)
+            print("✅ Agent run streamed.")
         except Exception as e:
-            print(f"❌ Error retrieving or saving messages: {e}")
+            print(f"❌ Error streaming run: {e}")
             return None
 
         ## Check if the response is in the expected JSON format
         try:
-            if hasattr(response, "data") and response.data:
-                sorted_messages = sorted(response.data, key=lambda x: x.created_at)
-                full_response = ""
-
-                for msg in sorted_messages:
-                    if msg.content and isinstance(msg.content, list):
-                        for content_item in msg.content:
-                            if content_item["type"] == "text":
-                                full_response += content_item["text"]["value"] + "\n"
+            if chunks:
+                full_response = "".join(chunks)
 
                 print("✅ Full response constructed.")
 
-                ## Extract the JSON block using regex to ensure we catch a proper JSON object
+                ## Parse a single object from the first '{'; raw_decode stops
+                ## at the balancing brace, so well-formed output takes this
+                ## fast path without any regex pass
                 try:
-                    json_response = json.loads(full_response)
+                    start = full_response.index("{")
+                    json_response, _ = _JSON_DECODER.raw_decode(full_response, start)
                     print(json.dumps(json_response))
-                except json.JSONDecodeError:
-                    json_block_match = re.search(r"```json\s*(\{.*?\})\s*```", full_response, re.DOTALL)
+                except (ValueError, json.JSONDecodeError):
+                    json_block_match = _JSON_BLOCK_RE.search(full_response)
                     if json_block_match:
                         json_response = json.loads(json_block_match.group(1))  # Use the captured group, not the full match
                         print(json.dumps(json_response))
                     else:
-                        json_response = json.loads(full_response[full_response.lower().find("your json response here:")+len("your json response here:"):].strip())
+                        ## Case-insensitive marker search avoids allocating a
+                        ## lowercased copy of the whole response
+                        marker_match = _MARKER_RE.search(full_response)
+                        start = marker_match.end() if marker_match else 0
+                        json_response = json.loads(full_response[start:].strip())
                         print(json.dumps(json_response))
 
                 ## write a json file with the response
-                output_file = os.path.join(self.output_dir, "risks.json") if self.output_dir else "risks.json"
-                with open(output_file, "w") as json_file:
-                    json.dump(json_response, json_file, indent=2)
-                    print(f"✅ JSON response saved to {output_file}.")
-                
+                self.write_outputs(json_response)
+
                 return json_response
-                
+
         except Exception as e:
             print(f"❌ Error processing messages: {e}")
             return None
+
+    ## Persist an already-parsed risks dict (also used by combined runs)
+    def write_outputs(self, json_block):
+        try:
+            ## Create the output directory up front instead of failing on
+            ## the write when it is missing
+            if self.output_dir:
+                os.makedirs(self.output_dir, exist_ok=True)
+                output_file = os.path.join(self.output_dir, "risks.json")
+            else:
+                output_file = "risks.json"
+            with open(output_file, "w") as json_file:
+                json.dump(json_block, json_file, indent=2)
+                print(f"✅ JSON response saved to {output_file}.")
+            return True
+        except Exception as e:
+            print(f"❌ Error saving risks: {e}")
+            return False
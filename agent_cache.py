@@ -0,0 +1,60 @@
+## Cache of resolved agent ids so reruns skip the list_agents scan
+import json
+import os
+import threading
+
+## Resolved ids survive process restarts via a small JSON sidecar
+_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".codeassist", "agent_ids.json")
+
+## In-process cache keyed by (conn_str, agent_name)
+_agent_ids = None
+
+## Both agent initializers may cache concurrently; the lock serializes
+## each read-modify-write cycle
+_lock = threading.Lock()
+
+def _load():
+    global _agent_ids
+    if _agent_ids is None:
+        try:
+            with open(_CACHE_PATH, "r", encoding="utf-8") as f:
+                _agent_ids = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            _agent_ids = {}
+    return _agent_ids
+
+def _write(cache):
+    ## Write atomically so concurrent runs never see a torn file
+    os.makedirs(os.path.dirname(_CACHE_PATH), exist_ok=True)
+    tmp_path = _CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, _CACHE_PATH)
+
+def _key(conn_str, agent_name):
+    return f"{conn_str}::{agent_name}"
+
+def get_cached_agent_id(conn_str, agent_name):
+    """Return the cached agent id for this connection/name, or None."""
+    with _lock:
+        return _load().get(_key(conn_str, agent_name))
+
+def cache_agent_id(conn_str, agent_name, agent_id):
+    """Remember a resolved agent id in memory and on disk."""
+    with _lock:
+        cache = _load()
+        cache[_key(conn_str, agent_name)] = agent_id
+        try:
+            _write(cache)
+        except OSError as e:
+            print(f"⚠️ Could not persist agent id cache: {e}")
+
+def drop_cached_agent_id(conn_str, agent_name):
+    """Forget a cached id that turned out to be stale."""
+    with _lock:
+        cache = _load()
+        if cache.pop(_key(conn_str, agent_name), None) is not None:
+            try:
+                _write(cache)
+            except OSError:
+                pass
@@ -1,47 +1,76 @@
 import os
-import time
 import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import json
-import markdown
-from bs4 import BeautifulSoup
+from markdown_it import MarkdownIt
 from docx import Document
 from docx.shared import Pt, Inches
 from dotenv import load_dotenv
 from azure.ai.projects import AIProjectClient
+from azure.ai.projects.models import MessageDeltaChunk
 from azure.identity import DefaultAzureCredential
 from json_repair import repair_json
 
+from agent_cache import cache_agent_id, drop_cached_agent_id, get_cached_agent_id
+from env_cache import _env
+from inventory import load_inventory
+
+# Compiled once at import; re.search would otherwise recompile per run
+_JSON_BLOCK_RE = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+# Shared decoder; raw_decode parses a single object from an offset and
+# stops at the balancing brace, so surrounding prose is ignored
+_JSON_DECODER = json.JSONDecoder()
+
+# File extensions and exact filenames worth documenting; frozensets give
+# O(1) membership checks in the per-file filter
+_DOC_EXTS = frozenset({".py", ".md", ".txt", ".yaml"})
+_DOC_SPECIAL = frozenset({"Dockerfile", ".env.example"})
+
 class CodeDocumentationGenerator:
     """
     A class that generates technical and business documentation for a codebase
     using Azure AI services.
     """
-    
-    def __init__(self, conn_str=None, agent_name=None, model_id=None, code_directory=None, env_file=None):
+
+    # Markdown parser built once per process; emits a flat token stream
+    # that is much cheaper to walk than an HTML tree
+    _MD = MarkdownIt("commonmark", {"html": False}).enable("table")
+
+
+    def __init__(self, conn_str=None, agent_name=None, model_id=None, code_directory=None, env_file=None, project_client=None):
         """
         Initialize the CodeDocumentationGenerator with required parameters.
-        
+
         Args:
             conn_str (str, optional): Azure connection string
             agent_name (str, optional): Name of the AI agent
             model_id (str, optional): ID of the model to use
             code_directory (str, optional): Directory containing the code to document
             env_file (str, optional): Path to .env file to load environment variables from
+            project_client (AIProjectClient, optional): Shared client to reuse
+                instead of constructing a new one
         """
-        # Load environment variables if env_file is provided
-        if env_file and os.path.exists(env_file):
+        # Load environment variables if a non-default env_file is provided;
+        # the default .env is parsed once by the shared _env() cache
+        if env_file and env_file != ".env" and os.path.exists(env_file):
             load_dotenv(env_file)
-            
-        # Use provided parameters or environment variables
-        self.conn_str = conn_str or os.getenv("CONN_STR")
-        self.agent_name = agent_name or os.getenv("DOC_AGENT_NAME")
-        self.model_id = model_id or os.getenv("MODEL_ID")
-        self.code_directory = code_directory or os.getenv("CODE_DIRECTORY")
-        self.output_dir = os.getenv("OUTPUT_DIR")
-        # Initialize client and other properties
-        self.project_client = None
+
+        # Use provided parameters or cached environment variables
+        env = _env()
+        self.conn_str = conn_str or env["CONN_STR"]
+        self.agent_name = agent_name or env["DOC_AGENT_NAME"]
+        self.model_id = model_id or env["MODEL_ID"]
+        self.code_directory = code_directory or env["CODE_DIRECTORY"]
+        self.output_dir = env["OUTPUT_DIR"]
+        # Initialize client and other properties; a caller-supplied client
+        # is reused by initialize_client
+        self.project_client = project_client
         self.agent = None
         self.thread = None
+        # Streamed response text accumulated by run_agent
+        self._response_text = ""
         
         # Validate required parameters
         if not all([self.conn_str, self.agent_name, self.model_id, self.code_directory]):
@@ -53,10 +82,16 @@ class CodeDocumentationGenerator:
             raise ValueError(f"Missing required parameters: {', '.join(missing)}")
     
     def initialize_client(self):
-        """Initialize the Azure AI Project client."""
+        """Initialize the Azure AI Project client, reusing an injected one."""
+        if self.project_client is not None:
+            print("✅ Reusing shared client.")
+            return True
         try:
             self.project_client = AIProjectClient.from_connection_string(
-                credential=DefaultAzureCredential(),
+                credential=DefaultAzureCredential(
+                    exclude_interactive_browser_credential=True,
+                    exclude_visual_studio_code_credential=True,
+                ),
                 conn_str=self.conn_str,
             )
             print("✅ Client initialized successfully.")
@@ -67,17 +102,27 @@ class CodeDocumentationGenerator:
     
     def setup_agent(self):
         """Check if the agent exists, create it if not."""
+        # A cached id turns the O(N) list_agents scan into a single GET
+        cached_id = get_cached_agent_id(self.conn_str, self.agent_name)
+        if cached_id:
+            try:
+                self.agent = self.project_client.agents.get_agent(cached_id)
+                print(f"✅ Agent found (cached id): {self.agent.name}")
+                return True
+            except Exception:
+                # Stale id (agent deleted/recreated); fall back to listing
+                drop_cached_agent_id(self.conn_str, self.agent_name)
         try:
             # Try to find the agent by name
             agents = self.project_client.agents.list_agents()
             self.agent = None
-            
+
             for existing_agent in agents.data:
                 if existing_agent.name == self.agent_name:
                     self.agent = existing_agent
                     print(f"✅ Agent found: {self.agent.name}")
                     break
-    
+
             if self.agent is None:
                 # If the agent is not found, create it
                 self.agent = self.project_client.agents.create_agent(
@@ -88,7 +133,8 @@ class CodeDocumentationGenerator:
                     temperature=0.01,
                 )
                 print(f"✅ Agent created: {self.agent.name}")
-            
+
+            cache_agent_id(self.conn_str, self.agent_name, self.agent.id)
             return True
         except Exception as e:
             print(f"❌ Error checking/creating agent: {e}")
@@ -112,22 +158,17 @@ class CodeDocumentationGenerator:
             str: A summary of all code files
         """
         code_dir = self.code_directory
-        code_summary = ""
-        
-        for root, dirs, files in os.walk(code_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if file.endswith((".py", ".md", ".txt", ".yaml")) or file in ("Dockerfile", ".env.example"):
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            relative_path = os.path.relpath(file_path, code_dir)
-                            file_ext = file.split('.')[-1] if '.' in file else ''
-                            code_summary += f"\n\n### File: {relative_path}\n```{file_ext}\n{content}\n```\n"
-                    except Exception as e:
-                        print(f"⚠️ Failed to read {file_path}: {e}")
-        
-        return code_summary
+        parts = []
+
+        # load_inventory walks and reads the tree once per process; this
+        # method only filters and formats the cached entries
+        for relative_path, content in load_inventory(code_dir):
+            file = os.path.basename(relative_path)
+            if os.path.splitext(file)[1] in _DOC_EXTS or file in _DOC_SPECIAL:
+                file_ext = file.split('.')[-1] if '.' in file else ''
+                parts.append(f"\n\n### File: {relative_path}\n```{file_ext}\n{content}\n```\n")
+
+        return "".join(parts)
     
     def send_message(self, code_summary):
         """
@@ -161,62 +202,83 @@ class CodeDocumentationGenerator:
             return False
     
     def run_agent(self):
-        """Run the agent on the thread."""
+        """
+        Run the agent on the thread, streaming the response.
+
+        Streaming lets response tokens be consumed as they are produced
+        instead of blocking on the full run and re-downloading the whole
+        thread with list_messages afterwards.
+        """
         try:
-            run = self.project_client.agents.create_and_process_run(
+            # Accumulate text chunks in a list; repeated string += is
+            # quadratic in the total response size
+            chunks = []
+            with self.project_client.agents.create_stream(
                 thread_id=self.thread.id,
                 agent_id=self.agent.id
-            )
-            print("✅ Agent run started.")
-            
-            # Wait a moment for processing to begin
-            time.sleep(0.5)
+            ) as stream:
+                for event_type, event_data, _ in stream:
+                    if isinstance(event_data, MessageDeltaChunk):
+                        chunks.append(event_data.text)
+            self._response_text = "".join(chunks)
+            print("✅ Agent run streamed.")
             return True
         except Exception as e:
             print(f"❌ Error processing run: {e}")
             return False
-    
+
+    @staticmethod
+    def _parse_json_response(full_response):
+        """
+        Parse the agent's JSON response, repairing malformed output.
+
+        Args:
+            full_response (str): Raw response text from the agent
+
+        Returns:
+            dict or None: The parsed response, or None if parsing failed
+        """
+        # Parse a single object from the first '{'; well-formed output
+        # takes this fast path without any regex or repair pass
+        start = full_response.find("{")
+        if start == -1:
+            print("⚠️ No JSON object found in response.")
+            return None
+        try:
+            json_response, _ = _JSON_DECODER.raw_decode(full_response, start)
+            print(json.dumps(json_response))
+        except json.JSONDecodeError:
+            # Fall back to repairing a fenced block, or the raw tail
+            json_block_match = _JSON_BLOCK_RE.search(full_response)
+            candidate = json_block_match.group(1) if json_block_match else full_response[start:].strip()
+            try:
+                json_response = json.loads(repair_json(candidate))
+                print(json.dumps(json_response))
+            except json.JSONDecodeError as e:
+                print(f"⚠️ JSON parsing error: {e}")
+                return None
+        if isinstance(json_response, list):
+            json_response = json_response[0] if json_response else None
+        return json_response
+
     def retrieve_responses(self):
         """
-        Retrieve and process responses from the agent.
-        
+        Process the streamed response from the agent.
+
         Returns:
             tuple: (technical_doc, business_doc) or (None, None) if failed
         """
         try:
-            messages = self.project_client.agents.list_messages(thread_id=self.thread.id)
-            print("✅ Messages retrieved.")
-            
-            if not hasattr(messages, "data") or not messages.data:
-                print("⚠️ No messages found.")
+            full_response = self._response_text
+            if not full_response:
+                print("⚠️ No response received.")
                 return None, None
-                
-            sorted_messages = sorted(messages.data, key=lambda x: x.created_at)
-            full_response = ""
-            
-            for msg in sorted_messages:
-                if msg.content and isinstance(msg.content, list):
-                    for content_item in msg.content:
-                        if content_item["type"] == "text":
-                            full_response += content_item["text"]["value"] + "\n"
-            
+
             print("✅ Full response constructed.")
             print(full_response)
-            ## Extract the JSON block using regex to ensure we catch a proper JSON object
-            try:
-                json_block_match = re.search(r"```json\s*(\{.*?\})\s*```", full_response, re.DOTALL)
-                if json_block_match:
-                    # Extract the JSON block from the match
-                    json_response = json.loads(repair_json(json_block_match.group(1)))  # Use the captured group, not the full match
-                    print(json.dumps(json_response))
-                else:
-                    json_response = json.loads(repair_json(full_response[full_response.lower().find("{"):].strip()))
-                    print(json.dumps(json_response))
-            except json.JSONDecodeError as e:
-                print(f"⚠️ JSON parsing error: {e}")
+            json_response = self._parse_json_response(full_response)
+            if json_response is None:
                 return None, None
-            if isinstance(json_response, list):
-                json_response = json_response[0]
             tech_doc = json_response.get("technical", "").strip()
             biz_doc = json_response.get("business", "").strip()
             
@@ -246,26 +308,35 @@ class CodeDocumentationGenerator:
         if not tech_doc or not biz_doc:
             print("⚠️ Cannot save empty documentation.")
             return False
-            
-        output_directory = self.output_dir
-        
+
+        # Create the output directory up front so a missing directory
+        # fails here rather than midway through the writes
+        output_directory = Path(self.output_dir)
+        output_directory.mkdir(parents=True, exist_ok=True)
+
         try:
             # Save markdown files
-            with open(os.path.join(output_directory, "README_TECHNICAL.md"), "w", encoding="utf-8") as f:
-                f.write("# Technical Documentation\n\n" + tech_doc)
-            with open(os.path.join(output_directory, "README_BUSINESS.md"), "w", encoding="utf-8") as f:
-                f.write("# Business Documentation\n\n" + biz_doc)
+            (output_directory / "README_TECHNICAL.md").write_text(
+                "# Technical Documentation\n\n" + tech_doc, encoding="utf-8")
+            (output_directory / "README_BUSINESS.md").write_text(
+                "# Business Documentation\n\n" + biz_doc, encoding="utf-8")
             print("✅ Documentation files created successfully.")
             
-            # Convert to DOCX with proper formatting
-            self.convert_markdown_to_docx(
-                tech_doc,
-                os.path.join(output_directory, "README_TECHNICAL.docx")
-            )
-            self.convert_markdown_to_docx(
-                biz_doc,
-                os.path.join(output_directory, "README_BUSINESS.docx")
-            )
+            # Convert to DOCX with proper formatting; the two documents are
+            # independent, so run both conversions concurrently
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                tech_future = executor.submit(
+                    self.convert_markdown_to_docx,
+                    tech_doc,
+                    str(output_directory / "README_TECHNICAL.docx")
+                )
+                biz_future = executor.submit(
+                    self.convert_markdown_to_docx,
+                    biz_doc,
+                    str(output_directory / "README_BUSINESS.docx")
+                )
+                tech_future.result()
+                biz_future.result()
             print("✅ DOCX documentation files created successfully.")
             
             return True
@@ -274,79 +345,99 @@ class CodeDocumentationGenerator:
             return False
     
     @staticmethod
-    def convert_markdown_to_docx(markdown_text, output_file):
+    def _add_inline_runs(paragraph, inline_token):
+        """
+        Add runs for an inline token's children, preserving inline code,
+        bold, and italics.
+
+        Args:
+            paragraph: The docx paragraph to append runs to
+            inline_token: A markdown-it 'inline' token
+        """
+        bold = False
+        italic = False
+        for child in inline_token.children or []:
+            if child.type == "strong_open":
+                bold = True
+            elif child.type == "strong_close":
+                bold = False
+            elif child.type == "em_open":
+                italic = True
+            elif child.type == "em_close":
+                italic = False
+            elif child.type == "code_inline":
+                run = paragraph.add_run(child.content)
+                run.font.name = 'Courier New'
+                run.font.size = Pt(10)
+            elif child.type in ("softbreak", "hardbreak"):
+                paragraph.add_run("\n")
+            elif child.content:
+                run = paragraph.add_run(child.content)
+                run.bold = bold
+                run.italic = italic
+
+    @classmethod
+    def convert_markdown_to_docx(cls, markdown_text, output_file):
         """
         Convert markdown text to a Word document with proper formatting.
-        
+
         Args:
             markdown_text (str): The markdown text to convert
             output_file (str): Path to save the output docx file
         """
         # Create a new Document
         doc = Document()
-        
-        # Convert markdown to HTML
-        html_content = markdown.markdown(
-            markdown_text,
-            extensions=['extra', 'codehilite', 'tables', 'fenced_code']
-        )
-        
-        # Parse the HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Process each element
-        for element in soup.find_all():
+
+        # Walk the flat markdown-it token stream; each block-level element
+        # is visited exactly once, so nested text is never duplicated
+        tokens = cls._MD.parse(markdown_text)
+        list_styles = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+
             # Process headings
-            if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                # Get heading level
-                level = int(element.name[1])
+            if token.type == "heading_open":
+                level = int(token.tag[1])
                 heading = doc.add_heading('', level=level)
-                heading.add_run(element.get_text()).bold = True
-                
-            # Process paragraphs
-            elif element.name == 'p':
-                if element.find('code'):
-                    # Inline code in paragraph
-                    p = doc.add_paragraph()
-                    for content in element.contents:
-                        if hasattr(content, 'name') and content.name == 'code':
-                            run = p.add_run(content.get_text())
-                            run.font.name = 'Courier New'
-                            run.font.size = Pt(10)
-                        else:
-                            p.add_run(str(content))
+                # Walk the inline children like paragraphs do, so bold,
+                # italic and inline code inside headings keep their
+                # formatting; the heading style already renders bold
+                cls._add_inline_runs(heading, tokens[i + 1])
+                i += 2  # skip the inline token
+
+            # Process paragraphs (plain or inside a list item)
+            elif token.type == "paragraph_open":
+                if list_styles:
+                    p = doc.add_paragraph(style=list_styles[-1])
                 else:
-                    # Regular paragraph
-                    doc.add_paragraph(element.get_text())
-                    
+                    p = doc.add_paragraph()
+                cls._add_inline_runs(p, tokens[i + 1])
+                i += 2  # skip the inline token
+
             # Process code blocks
-            elif element.name == 'pre':
-                # Code block
-                code_text = element.get_text()
+            elif token.type in ("fence", "code_block"):
                 p = doc.add_paragraph()
                 p.style = 'No Spacing'
-                code_run = p.add_run(code_text)
+                code_run = p.add_run(token.content)
                 code_run.font.name = 'Courier New'
                 code_run.font.size = Pt(10)
                 p.paragraph_format.left_indent = Inches(0.5)
-                
-            # Process lists
-            elif element.name == 'li':
-                # Check if parent is ul or ol
-                if element.parent.name == 'ul':
-                    # Unordered list item
-                    p = doc.add_paragraph(style='List Bullet')
-                    p.add_run(element.get_text())
-                elif element.parent.name == 'ol':
-                    # Ordered list item
-                    p = doc.add_paragraph(style='List Number')
-                    p.add_run(element.get_text())
-                    
+
+            # Track list nesting so list-item paragraphs get the right style
+            elif token.type == "bullet_list_open":
+                list_styles.append('List Bullet')
+            elif token.type == "ordered_list_open":
+                list_styles.append('List Number')
+            elif token.type in ("bullet_list_close", "ordered_list_close"):
+                list_styles.pop()
+
             # Process horizontal rules
-            elif element.name == 'hr':
-                # Horizontal rule
+            elif token.type == "hr":
                 doc.add_paragraph('_' * 50)
-        
+
+            i += 1
+
         # Save the document
         doc.save(output_file)
     
@@ -384,5 +475,64 @@ class CodeDocumentationGenerator:
         tech_doc, biz_doc = self.retrieve_responses()
         if not tech_doc or not biz_doc:
             return False
-            
+
+        return self.save_documentation(tech_doc, biz_doc)
+
+    def run_prompt(self, prompt):
+        """
+        Send an arbitrary prompt through the agent and parse its JSON reply.
+
+        Used for combined runs where several analyses share one agent call.
+
+        Args:
+            prompt (str): Full message content to send
+
+        Returns:
+            dict or None: The parsed JSON response, or None on failure
+        """
+        if not self.initialize_client():
+            return None
+
+        if not self.setup_agent():
+            return None
+
+        if not self.create_thread():
+            return None
+
+        try:
+            self.project_client.agents.create_message(
+                thread_id=self.thread.id,
+                role="user",
+                content=prompt
+            )
+            print("✅ Message sent.")
+        except Exception as e:
+            print(f"❌ Error sending message: {e}")
+            return None
+
+        if not self.run_agent():
+            return None
+
+        if not self._response_text:
+            print("⚠️ No response received.")
+            return None
+
+        return self._parse_json_response(self._response_text)
+
+    def write_outputs(self, json_block):
+        """
+        Save documentation from an already-parsed response dict.
+
+        Args:
+            json_block (dict): Parsed response containing 'technical' and
+                'business' keys
+
+        Returns:
+            bool: True if documentation was saved successfully, False otherwise
+        """
+        tech_doc = (json_block.get("technical") or "").strip()
+        biz_doc = (json_block.get("business") or "").strip()
+        if not tech_doc or not biz_doc:
+            print("⚠️ Response is missing documentation keys.")
+            return False
         return self.save_documentation(tech_doc, biz_doc)
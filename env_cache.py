@@ -0,0 +1,20 @@
+## Shared cached access to the .env-backed configuration
+import functools
+import os
+from dotenv import load_dotenv
+
+## Keys the agent classes read from the environment
+_ENV_KEYS = (
+    "CONN_STR",
+    "GUARD_AGENT_NAME",
+    "DOC_AGENT_NAME",
+    "MODEL_ID",
+    "CODE_DIRECTORY",
+    "OUTPUT_DIR",
+)
+
+@functools.lru_cache(maxsize=1)
+def _env():
+    """Parse the .env file once and cache the configuration values."""
+    load_dotenv()
+    return {key: os.environ.get(key) for key in _ENV_KEYS}
@@ -0,0 +1,69 @@
+## Shared, cached snapshot of the code directory. The tree is walked and
+## read once per process; each agent formats the same inventory instead
+## of re-walking and re-reading the filesystem.
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+## Cap per-file bytes so a single blob cannot blow up any prompt
+MAX_FILE_BYTES = 64 * 1024
+
+## Vendored/generated directories no agent needs to look at
+SKIP_DIRS = frozenset({".git", "node_modules", "__pycache__", "dist", "build", ".venv"})
+
+## Union of everything any agent may want to format; each formatter
+## filters down to its own extensions
+_INVENTORY_EXTS = frozenset({
+    ".py", ".js", ".java", ".cpp", ".c", ".html", ".yaml", ".md", ".txt",
+})
+_INVENTORY_SPECIAL = frozenset({"Dockerfile", ".env.example"})
+
+def _read_entry(root, path):
+    """Read one file, capped and decoded; returns (relpath, text) or None."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(MAX_FILE_BYTES)
+            truncated = bool(f.read(1))
+        text = raw.decode("utf-8", "ignore")
+        if truncated:
+            text += "\n...[truncated]"
+        return (os.path.relpath(path, root), text)
+    except OSError as e:
+        print(f"⚠️ Failed to read {path}: {e}")
+        return None
+
+@functools.lru_cache(maxsize=None)
+def load_inventory(root):
+    """
+    Walk root once and return a tuple of (relpath, text) entries.
+
+    Files are read in binary, capped at MAX_FILE_BYTES with a
+    '...[truncated]' marker, and decoded once. Reads are fanned out over
+    a thread pool since the phase is pure I/O wait; the sorted path list
+    plus executor.map keeps the result order deterministic. Safe to
+    cache because the agents never mutate files between passes.
+    """
+    paths = []
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if (os.path.splitext(entry.name)[1] in _INVENTORY_EXTS
+                            or entry.name in _INVENTORY_SPECIAL):
+                        paths.append(entry.path)
+        except OSError as e:
+            print(f"❌ Error scanning {current}: {e}")
+    paths.sort()
+
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_read_entry, (root for _ in paths), paths))
+    return tuple(entry for entry in results if entry is not None)
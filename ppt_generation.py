@@ -1,11 +1,98 @@
+import asyncio
 import os
-import time
+import re
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from string import Template
 from dotenv import load_dotenv
 from typing import Optional, List, Dict, Any, Union
-from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import FileSearchTool, MessageAttachment, FilePurpose, CodeInterpreterTool
-from azure.identity import DefaultAzureCredential
+
+## The Azure SDK packages pull in hundreds of submodules, so they are
+## imported inside the methods that first need them; module import and
+## CLI startup stay fast and cold starts only pay for what runs
+
+from agent_cache import cache_agent_id, drop_cached_agent_id, get_cached_agent_id
+from inventory import load_inventory
+from throttle import agents_call
+from upload_cache import cache_file_id, drop_cached_file_id, file_sha256, get_cached_file_id
+
+## Matches a closed python code fence in the streamed PPT response
+_PYTHON_BLOCK_RE = re.compile(r"```python\n(.*?)\n```", re.DOTALL)
+
+## O(1) membership checks for the code-summary filter
+_CODE_SUFFIXES = frozenset({".py", ".md", ".txt"})
+_CODE_FILENAMES = frozenset({"Dockerfile", ".env.example"})
+
+## Namespaces vector-store ingestion entries in the shared upload cache;
+## a plain input-document upload does not imply vector-store membership,
+## so the two uses must not share keys
+_VS_CACHE_PREFIX = "md_vectorstore::"
+
+
+@dataclass(frozen=True, slots=True)
+class PPTConfig:
+    """Environment configuration for the PPT pipeline, loaded once."""
+    conn_str: str
+    model_id: str
+    output_dir: str
+    ppt_input_path: str
+    ppt_output_path: str
+
+    _ENV_KEYS = (
+        "CONN_STR",
+        "MODEL_ID",
+        "OUTPUT_DIR",
+        "PPT_INPUT_PATH",
+        "PPT_OUTPUT_PATH",
+    )
+
+    @classmethod
+    def from_env(cls) -> "PPTConfig":
+        """
+        Read and validate every required variable up front, so a missing
+        key fails immediately with a clear message instead of as a
+        KeyError halfway through agent initialization.
+        """
+        missing = [key for key in cls._ENV_KEYS if not os.environ.get(key)]
+        if missing:
+            raise EnvironmentError(
+                f"Missing required environment variables: {', '.join(missing)}"
+            )
+        return cls(*(os.environ[key] for key in cls._ENV_KEYS))
+
+
+@dataclass(slots=True)
+class AgentRunResult:
+    """The text and attachment file ids of an agent's newest message."""
+    text: str
+    attachments: List[str]
+
+
+def _parse_run(messages) -> AgentRunResult:
+    """
+    Walk the SDK's nested message payload once into an AgentRunResult.
+
+    Keeping the dict-chain indexing in one place means downstream code
+    reads plain attributes and only this helper needs to change if the
+    SDK reshapes its response.
+    """
+    data = messages.get('data') or []
+    if not data:
+        return AgentRunResult(text="", attachments=[])
+    newest = data[0]
+    text_parts = [
+        part['text']['value']
+        for part in newest.get('content') or []
+        if part.get('type') == 'text'
+    ]
+    attachments = [
+        attachment['file_id']
+        for attachment in newest.get('attachments') or []
+    ]
+    return AgentRunResult(text="".join(text_parts), attachments=attachments)
 
 
 class PPTGenerator:
@@ -21,6 +108,11 @@ class PPTGenerator:
         credential=None,
         logger=None,
         env_file: Optional[str] = None,
+        project_client=None,
+        on_chunk=None,
+        ppt_max_completion_tokens: int = 4000,
+        code_max_completion_tokens: int = 1500,
+        temperature: float = 0.2,
     ):
         """
         Initialize the PPT Generator with configuration settings.
@@ -32,25 +124,63 @@ class PPTGenerator:
             model: AI model to use (e.g., gpt-4o)
             credential: Azure credential object, defaults to DefaultAzureCredential
             logger: Optional logger, defaults to basic logging configuration
+            project_client: Shared AIProjectClient to reuse instead of
+                constructing a new one
+            on_chunk: Optional callable invoked with each streamed text
+                delta, for progressive rendering
+            ppt_max_completion_tokens: Output cap for the PPT agent run;
+                a big deck needs room, but generation time scales with it
+            code_max_completion_tokens: Output cap for the code agent run
+            temperature: Sampling temperature for both runs
         """
         # Load environment variables if env_file is provided
         if env_file and os.path.exists(env_file):
             load_dotenv(env_file)
 
-        self.conn_str = os.environ['CONN_STR']
-        self.model = os.environ['MODEL_ID']
+        # All required environment variables are validated here, once
+        self.cfg = PPTConfig.from_env()
+        self.conn_str = self.cfg.conn_str
+        self.model = self.cfg.model_id
         self.ppt_agent_name = ppt_agent_name
         self.code_agent_name = code_agent_name
-        self.credential = credential or DefaultAzureCredential()
+        self.on_chunk = on_chunk
+        self.ppt_max_completion_tokens = ppt_max_completion_tokens
+        self.code_max_completion_tokens = code_max_completion_tokens
+        self.temperature = temperature
+        if credential is None:
+            from azure.identity import DefaultAzureCredential
+            credential = DefaultAzureCredential(
+                exclude_interactive_browser_credential=True,
+                exclude_visual_studio_code_credential=True,
+            )
+        self.credential = credential
         
         # Set up logging
         self.logger = logger or self._setup_logger()
         
-        # Initialize client and other properties to None
-        self.project_client = None
+        # Initialize client and other properties; a caller-supplied client
+        # is reused by initialize_client
+        self.project_client = project_client
         self.ppt_agent = None
         self.code_agent = None
         self.thread = None
+        # Name -> agent map shared by both agent initializers, so at most
+        # one list_agents call is made per instance
+        self._agents_by_name = None
+        self._agents_lock = threading.Lock()
+        # Vector store backing the PPT agent's file search tool
+        self._vector_store_id = None
+        # Code dirs already ingested by this instance; repeat runs and
+        # batch jobs skip the whole upload pass. The lock keeps
+        # concurrent jobs from racing the check and double-ingesting
+        self._ingested_code_dirs = set()
+        self._ingest_lock = threading.Lock()
+
+        # Prompt template read once at init; run_ppt_generation only
+        # substitutes the per-call fields
+        template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts", "ppt_prompt.tmpl")
+        with open(template_path, "r", encoding="utf-8") as f:
+            self._prompt_template = Template(f.read())
 
     def _setup_logger(self) -> logging.Logger:
         """Set up and configure a logger for the class."""
@@ -70,7 +200,11 @@ class PPTGenerator:
         Returns:
             bool: True if successful, False otherwise
         """
+        if self.project_client is not None:
+            self.logger.info("✅ Reusing shared client.")
+            return True
         try:
+            from azure.ai.projects import AIProjectClient
             self.project_client = AIProjectClient.from_connection_string(
                 credential=self.credential,
                 conn_str=self.conn_str,
@@ -78,31 +212,68 @@ class PPTGenerator:
             self.logger.info("✅ Client initialized successfully.")
             return True
         except Exception as e:
-            self.logger.error(f"❌ Error initializing client: {e}")
+            self.logger.error("❌ Error initializing client: %s", e)
             return False
 
+    def _resolve_agent(self, agent_name):
+        """
+        Resolve an agent by name without re-listing when avoidable.
+
+        A persisted id gives a single GET; otherwise one shared
+        list_agents call is made per instance and reused for both agents.
+
+        Returns:
+            The agent, or None if no agent with that name exists yet
+        """
+        cached_id = get_cached_agent_id(self.conn_str, agent_name)
+        if cached_id:
+            try:
+                return agents_call(self.project_client.agents.get_agent, cached_id)
+            except Exception:
+                # Stale id (agent deleted/recreated); fall back to listing
+                drop_cached_agent_id(self.conn_str, agent_name)
+        # Both initializers may run concurrently; the lock keeps the
+        # shared listing to a single call
+        with self._agents_lock:
+            if self._agents_by_name is None:
+                agents = agents_call(self.project_client.agents.list_agents)
+                self._agents_by_name = {agent.name: agent for agent in agents.data}
+        agent = self._agents_by_name.get(agent_name)
+        if agent is not None:
+            cache_agent_id(self.conn_str, agent_name, agent.id)
+        return agent
+
     def initialize_ppt_agent(self) -> bool:
         """
         Initialize or retrieve the PowerPoint generation agent.
-        
+
         Returns:
             bool: True if successful, False otherwise
         """
         try:
+            # Operator-pinned id skips discovery entirely: one GET, no
+            # cache files and no listing
+            pinned_id = os.environ.get("PPT_AGENT_ID")
+            if pinned_id:
+                self.ppt_agent = agents_call(self.project_client.agents.get_agent, pinned_id)
+                self.logger.info("✅ Agent pinned via PPT_AGENT_ID: %s", self.ppt_agent.name)
+                return True
+
             # Try to find the agent by name
-            agents = self.project_client.agents.list_agents()
-            for existing_agent in agents.data:
-                if existing_agent.name == self.ppt_agent_name:
-                    self.ppt_agent = existing_agent
-                    self.logger.info(f"✅ Agent found: {self.ppt_agent.name}")
-                    return True
+            self.ppt_agent = self._resolve_agent(self.ppt_agent_name)
+            if self.ppt_agent is not None:
+                self.logger.info("✅ Agent found: %s", self.ppt_agent.name)
+                return True
 
             # If not found, create a new agent
-            vector_store = self.project_client.agents.create_vector_store(name="md_vectorstore")
-            self.logger.info(f"Created vector store, vector store ID: {vector_store.id}")
+            from azure.ai.projects.models import FileSearchTool
+            vector_store = agents_call(self.project_client.agents.create_vector_store, name="md_vectorstore")
+            self._vector_store_id = vector_store.id
+            self.logger.info("Created vector store, vector store ID: %s", vector_store.id)
 
             file_search_tool = FileSearchTool(vector_store_ids=[vector_store.id])
-            self.ppt_agent = self.project_client.agents.create_agent(
+            self.ppt_agent = agents_call(
+                self.project_client.agents.create_agent,
                 model=self.model,
                 name=self.ppt_agent_name,
                 description="An agent that transforms documentation into PowerPoint slides.",
@@ -112,10 +283,11 @@ class PPTGenerator:
                 tools=file_search_tool.definitions,
                 tool_resources=file_search_tool.resources,
             )
-            self.logger.info(f"✅ Agent created: {self.ppt_agent.name}")
+            self.logger.info("✅ Agent created: %s", self.ppt_agent.name)
+            cache_agent_id(self.conn_str, self.ppt_agent_name, self.ppt_agent.id)
             return True
         except Exception as e:
-            self.logger.error(f"❌ Error checking/creating PPT agent: {e}")
+            self.logger.error("❌ Error checking/creating PPT agent: %s", e)
             return False
 
     def initialize_code_agent(self) -> bool:
@@ -126,17 +298,24 @@ class PPTGenerator:
             bool: True if successful, False otherwise
         """
         try:
+            # Operator-pinned id skips discovery entirely
+            pinned_id = os.environ.get("CODE_AGENT_ID")
+            if pinned_id:
+                self.code_agent = agents_call(self.project_client.agents.get_agent, pinned_id)
+                self.logger.info("✅ Agent pinned via CODE_AGENT_ID: %s", self.code_agent.name)
+                return True
+
             # Try to find the agent by name
-            agents = self.project_client.agents.list_agents()
-            for existing_agent in agents.data:
-                if existing_agent.name == self.code_agent_name:
-                    self.code_agent = existing_agent
-                    self.logger.info(f"✅ Agent found: {self.code_agent.name}")
-                    return True
+            self.code_agent = self._resolve_agent(self.code_agent_name)
+            if self.code_agent is not None:
+                self.logger.info("✅ Agent found: %s", self.code_agent.name)
+                return True
 
             # If not found, create a new agent
+            from azure.ai.projects.models import CodeInterpreterTool
             code_interpreter = CodeInterpreterTool()
-            self.code_agent = self.project_client.agents.create_agent(
+            self.code_agent = agents_call(
+                self.project_client.agents.create_agent,
                 model=self.model,
                 name=self.code_agent_name,
                 description="An agent that executes code generated.",
@@ -144,10 +323,11 @@ class PPTGenerator:
                 tools=code_interpreter.definitions,
                 tool_resources=code_interpreter.resources,
             )
-            self.logger.info(f"✅ Agent created: {self.code_agent.name}")
+            self.logger.info("✅ Agent created: %s", self.code_agent.name)
+            cache_agent_id(self.conn_str, self.code_agent_name, self.code_agent.id)
             return True
         except Exception as e:
-            self.logger.error(f"❌ Error checking/creating code agent: {e}")
+            self.logger.error("❌ Error checking/creating code agent: %s", e)
             return False
 
     def create_thread(self) -> bool:
@@ -158,11 +338,11 @@ class PPTGenerator:
             bool: True if successful, False otherwise
         """
         try:
-            self.thread = self.project_client.agents.create_thread()
+            self.thread = agents_call(self.project_client.agents.create_thread)
             self.logger.info("✅ Thread created.")
             return True
         except Exception as e:
-            self.logger.error(f"❌ Error creating thread: {e}")
+            self.logger.error("❌ Error creating thread: %s", e)
             return False
 
     def generate_code_summary(self, code_dir: str) -> str:
@@ -175,154 +355,290 @@ class PPTGenerator:
         Returns:
             str: Formatted summary of code files
         """
-        code_summary = ""
-        for root, dirs, files in os.walk(code_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if file.endswith((".py", ".md", ".txt")) or file in ("Dockerfile", ".env.example"):
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            relative_path = os.path.relpath(file_path, code_dir)
-                            code_summary += f"\n\n### File: {relative_path}\n```{file.split('.')[-1]}\n{content}\n```\n"
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ Failed to read {file_path}: {e}")
-        return code_summary
+        # load_inventory walks and reads the tree once per process; this
+        # method only filters and formats the cached entries
+        parts = []
+        for relative_path, content in load_inventory(code_dir):
+            file = os.path.basename(relative_path)
+            ext = os.path.splitext(file)[1]
+            if ext in _CODE_SUFFIXES or file in _CODE_FILENAMES:
+                lang = ext[1:] if ext else file
+                parts.append(f"\n\n### File: {relative_path}\n```{lang}\n{content}\n```\n")
+        return "".join(parts)
+
+    def _get_vector_store_id(self) -> str:
+        """
+        Return the id of the md_vectorstore, resolving or creating it.
+
+        Returns:
+            str: The vector store id
+        """
+        if self._vector_store_id:
+            return self._vector_store_id
+        stores = agents_call(self.project_client.agents.list_vector_stores)
+        for store in stores.data:
+            if store.name == "md_vectorstore":
+                self._vector_store_id = store.id
+                return store.id
+        vector_store = agents_call(self.project_client.agents.create_vector_store, name="md_vectorstore")
+        self._vector_store_id = vector_store.id
+        return vector_store.id
+
+    def _upload_code_files(self, code_dir: str) -> None:
+        """
+        Batch-ingest the project's code files into the vector store.
+
+        Uploads run in parallel and the new files are attached to the
+        store in one create_vector_store_file_batch call, so the agent
+        can retrieve code through file search instead of receiving the
+        whole summary inline on every prompt. Files whose content digest
+        is already in the upload cache are skipped, so repeat runs,
+        retries and batch jobs neither re-upload nor pile duplicate
+        copies into the persistent vector store.
+
+        Args:
+            code_dir: Directory containing the code files
+        """
+        from azure.ai.projects.models import FilePurpose
+        # The whole check/upload/attach/record sequence runs under the
+        # lock so concurrent batch jobs cannot both pass the guard and
+        # double-ingest the same directory
+        with self._ingest_lock:
+            if code_dir in self._ingested_code_dirs:
+                return
+            paths = [os.path.join(code_dir, relpath) for relpath, _ in load_inventory(code_dir)]
+            # Skip only content whose namespaced digest marks it as
+            # attached to the vector store; a plain input-document
+            # upload of the same content does not count
+            new_paths = [
+                path for path in paths
+                if get_cached_file_id(_VS_CACHE_PREFIX + file_sha256(path)) is None
+            ]
+            if not new_paths:
+                self._ingested_code_dirs.add(code_dir)
+                if paths:
+                    self.logger.info("All %s code files already ingested; skipping upload.", len(paths))
+                return
+            with ThreadPoolExecutor(max_workers=min(8, len(new_paths))) as executor:
+                uploaded = list(executor.map(
+                    lambda path: agents_call(
+                        self.project_client.agents.upload_file_and_poll,
+                        file_path=path,
+                        purpose=FilePurpose.AGENTS
+                    ),
+                    new_paths
+                ))
+            agents_call(
+                self.project_client.agents.create_vector_store_file_batch,
+                vector_store_id=self._get_vector_store_id(),
+                file_ids=[uploaded_file.id for uploaded_file in uploaded]
+            )
+            # Record digests only after the batch attach succeeds, so a
+            # failed ingestion is retried in full next run
+            for path, uploaded_file in zip(new_paths, uploaded):
+                cache_file_id(_VS_CACHE_PREFIX + file_sha256(path), uploaded_file.id)
+            self._ingested_code_dirs.add(code_dir)
+            self.logger.info("Ingested %s new code files into the vector store.", len(uploaded))
 
     def run_ppt_generation(
-        self, 
-        input_file: str, 
-        code_dir: Optional[str] = None
-    ) -> Dict[str, Any]:
+        self,
+        input_file: str,
+        code_dir: Optional[str] = None,
+        on_code_block=None,
+        thread_id: Optional[str] = None
+    ) -> str:
         """
         Run the PowerPoint generation process using the PPT agent.
-        
+
         Args:
             input_file: Path to the input documentation file
             code_dir: Optional path to code directory to include in generation
-            
+            on_code_block: Optional callable fired with the first complete
+                python code block in the stream (see _stream_run)
+            thread_id: Thread to run on; defaults to the instance thread,
+                batch jobs pass their own
+
         Returns:
-            dict: Agent response messages
+            str: The streamed response text from the PPT agent
         """
-        # Upload the input file
-        message_file = self.project_client.agents.upload_file_and_poll(
-            file_path=input_file, 
-            purpose=FilePurpose.AGENTS
-        )
-        self.logger.info(f"Uploaded file, file ID: {message_file.id}")
-        attachment = MessageAttachment(file_id=message_file.id, tools=FileSearchTool().definitions)
+        if thread_id is None:
+            thread_id = self.thread.id
+        from azure.ai.projects.models import FilePurpose, FileSearchTool, MessageAttachment
+
+        # Reuse a previous upload when the file contents are unchanged;
+        # retries and reruns then skip the upload-and-poll round-trip
+        digest = file_sha256(input_file)
+        file_id = get_cached_file_id(digest)
+        if file_id:
+            try:
+                agents_call(self.project_client.agents.get_file, file_id)
+                self.logger.info("Reusing uploaded file, file ID: %s", file_id)
+            except Exception:
+                # The cached file was deleted server-side; upload again
+                drop_cached_file_id(digest)
+                file_id = None
+        if file_id is None:
+            message_file = agents_call(
+                self.project_client.agents.upload_file_and_poll,
+                file_path=input_file,
+                purpose=FilePurpose.AGENTS
+            )
+            file_id = message_file.id
+            cache_file_id(digest, file_id)
+            self.logger.info("Uploaded file, file ID: %s", file_id)
+        attachment = MessageAttachment(file_id=file_id, tools=FileSearchTool().definitions)
 
-        # Create the content prompt
+        # Create the content prompt from the shared template; the only
+        # delta between the two variants is the code section sentence
         if code_dir:
-            code_summary = self.generate_code_summary(code_dir)
-            content = f"""You are provided with the content of a markdown file in the file {input_file}. You are also provided with code files from the same project.
-            Generate a powerpoint slide deck based on those files and store it in .pptx format.
-            Generate a Python script that creates this slide deck using the python-pptx library.
-            Use font size no bigger than 20 for the slide content. Titles can have bigger font.
-            Add customization to parts of text, for example, if you have points that are in bold (between ** in the content), generate them as bold font in the slide. Make sure to remove the asterisks (**) in the slides.
-            Use a professional theme with blue palette for the slides.
-
-            Follow these steps:
-            1. Generate a structure of the content of the slides based on the provided files. Be descriptive and include all the important points.
-            2. Generate a markdown file based on the structure you created.
-            3. Convert the markdown file into a PowerPoint slide deck using the python-pptx library.
-            4. In the code make sure to save the pptx file in the end.
-
-            Summary of the code files: 
-            {code_summary}
-            """
+            # The code files are ingested into the vector store and found
+            # via file search, so prompt tokens stay O(template) instead
+            # of O(total code size) on every run
+            self._upload_code_files(code_dir)
+            code_section = " You are also provided with code files from the same project, available through file search."
         else:
-            content = f"""You are provided with the content of a markdown file in the file {input_file}.
-            Generate a powerpoint slide deck based on that file and store it in .pptx format.
-            Generate a Python script that creates this slide deck using the python-pptx library.
-            Use font size no bigger than 20 for the slide content. Titles can have bigger font.
-            Add customization to parts of text, for example, if you have points that are in bold (between ** in the content), generate them as bold font in the slide. Make sure to remove the asterisks (**) in the slides.
-            Use a professional theme with blue palette for the slides.
-
-            Follow these steps:
-            1. Generate a structure of the content of the slides based on the provided file. Be descriptive and include all the important points.
-            2. Generate a markdown file based on the structure you created.
-            3. Convert the markdown file into a PowerPoint slide deck using the python-pptx library.
-            4. In the code make sure to save the pptx file in the end.
-            """
+            code_section = ""
+        content = self._prompt_template.substitute(
+            input_file=input_file,
+            code_section=code_section
+        )
 
         # Create and process the message
-        message = self.project_client.agents.create_message(
-            thread_id=self.thread.id,
+        message = agents_call(
+            self.project_client.agents.create_message,
+            thread_id=thread_id,
             role="user",
             content=content,
             attachments=[attachment]
         )
-        self.logger.info(f"Created message, message ID: {message.id}")
-
-        # Run the PPT generation agent
-        run = self.project_client.agents.create_and_process_run(
-            thread_id=self.thread.id, 
-            agent_id=self.ppt_agent.id
+        self.logger.info("Created message, message ID: %s", message.id)
+
+        # Stream the PPT generation run; text arrives as it is produced
+        # and a stuck run cannot hang a blocking create_and_process_run
+        ppt_response_text = self._stream_run(
+            self.ppt_agent.id,
+            thread_id,
+            on_code_block=on_code_block,
+            max_completion_tokens=self.ppt_max_completion_tokens
         )
-        self.logger.info(f"Created run, run ID: {run.id}")
+        self.logger.info("PPT agent run streamed.")
+        return ppt_response_text
 
-        # Get the messages from the run
-        messages = self.project_client.agents.list_messages(
-            thread_id=self.thread.id, 
-            run_id=run.id
-        )
-        return messages
+    def _stream_run(self, agent_id: str, thread_id: str, on_code_block=None, max_completion_tokens: Optional[int] = None) -> str:
+        """
+        Stream a run on the given thread and return its full text.
 
-    def run_code_execution(self, ppt_agent_messages: Dict[str, Any]) -> Dict[str, Any]:
+        Each delta is forwarded to the on_chunk callback, if one was
+        provided, so callers can render progressively. If on_code_block is
+        given, it fires once as soon as the first closed ```python fence
+        appears in the stream, so downstream work can start before the
+        model emits its trailing prose.
+
+        Args:
+            agent_id: ID of the agent to run
+            thread_id: ID of the thread to run on
+            on_code_block: Optional callable invoked with the first
+                complete python code block
+            max_completion_tokens: Output-token cap for the run, bounding
+                worst-case generation time
+
+        Returns:
+            str: The accumulated response text
+        """
+        from azure.ai.projects.models import MessageDeltaChunk
+
+        chunks = []
+        code_block_fired = False
+        with agents_call(
+            self.project_client.agents.create_stream,
+            thread_id=thread_id,
+            agent_id=agent_id,
+            max_completion_tokens=max_completion_tokens,
+            temperature=self.temperature
+        ) as stream:
+            for event_type, event_data, _ in stream:
+                if isinstance(event_data, MessageDeltaChunk):
+                    chunks.append(event_data.text)
+                    if self.on_chunk is not None:
+                        self.on_chunk(event_data.text)
+                    # Only rescan the buffer when a fence may have closed
+                    if (on_code_block is not None and not code_block_fired
+                            and "```" in event_data.text):
+                        match = _PYTHON_BLOCK_RE.search("".join(chunks))
+                        if match:
+                            code_block_fired = True
+                            on_code_block(match.group(1))
+        return "".join(chunks)
+
+    def run_code_execution(self, ppt_response_text: str) -> AgentRunResult:
         """
         Run code execution using the code agent on the PPT agent's output.
-        
+
+        Runs on its own thread so it can start while the PPT agent's run
+        is still streaming on the main thread.
+
         Args:
-            ppt_agent_messages: Messages from the PPT agent
-            
+            ppt_response_text: Code block or response text from the PPT agent
+
         Returns:
-            dict: Agent response messages
+            AgentRunResult: The code agent's final message, parsed
         """
+        # A thread with an active run rejects new messages, so execute on
+        # a dedicated thread; the code agent needs no prior context
+        exec_thread = agents_call(self.project_client.agents.create_thread)
+        self.logger.info("Created execution thread, thread ID: %s", exec_thread.id)
+
         # Create the message to execute the code
-        message2 = self.project_client.agents.create_message(
-            thread_id=self.thread.id,
+        message2 = agents_call(
+            self.project_client.agents.create_message,
+            thread_id=exec_thread.id,
             role="user",
-            content="You are provided with the output of the previous PPT slides agent. Extract the code from their response and execute it, then store the output files in the thread. If the file name is not given, use as you see appropriate.\n\n###Content:\n" + ppt_agent_messages['data'][0]['content'][0]['text']['value'],
+            content="You are provided with the output of the previous PPT slides agent. Extract the code from their response and execute it, then store the output files in the thread. If the file name is not given, use as you see appropriate.\n\n###Content:\n" + ppt_response_text,
         )
-        self.logger.info(f"Created message, message ID: {message2.id}")
-
-        # Run the code execution agent
-        run2 = self.project_client.agents.create_and_process_run(
-            thread_id=self.thread.id, 
-            agent_id=self.code_agent.id
+        self.logger.info("Created message, message ID: %s", message2.id)
+
+        # Stream the code execution run
+        self._stream_run(self.code_agent.id, exec_thread.id, max_completion_tokens=self.code_max_completion_tokens)
+        self.logger.info("Code agent run streamed.")
+
+        # The generated .pptx arrives as an attachment on the final
+        # message, so fetch just the newest message once the stream ends
+        messages2 = agents_call(
+            self.project_client.agents.list_messages,
+            thread_id=exec_thread.id,
+            order="desc",
+            limit=1
         )
-        self.logger.info(f"Run finished with status: {run2.status}")
+        return _parse_run(messages2)
 
-        # Get the messages from the code agent
-        messages2 = self.project_client.agents.list_messages(thread_id=self.thread.id)
-        return messages2
-
-    def save_presentation(self, code_agent_messages: Dict[str, Any], output_file: str, output_dir: str) -> bool:
+    def save_presentation(self, code_agent_result: AgentRunResult, output_file: str, output_dir: str) -> bool:
         """
         Save the generated presentation to a file.
-        
+
         Args:
-            code_agent_messages: Messages from the code agent
+            code_agent_result: Parsed final message from the code agent
             output_file: Path to save the generated presentation
-            
+
         Returns:
             bool: True if successful, False otherwise
         """
-        if os.path.exists(output_file):
-            os.remove(output_file)
-            self.logger.info(f"Removed existing file: {output_file}")
+        # unlink with missing_ok avoids the exists-then-remove race
+        Path(output_file).unlink(missing_ok=True)
 
         try:
-            self.project_client.agents.save_file(
-                file_id=code_agent_messages['data'][0]['attachments'][0]['file_id'], 
+            if not code_agent_result.attachments:
+                self.logger.error("❌ Code agent produced no output file to save.")
+                return False
+            agents_call(
+                self.project_client.agents.save_file,
+                file_id=code_agent_result.attachments[0],
                 file_name=output_file,
                 target_dir=output_dir
             )
-            self.logger.info(f"Saved presentation file to: {output_file}")
+            self.logger.info("Saved presentation file to: %s", output_file)
             return True
         except Exception as e:
-            self.logger.error(f"❌ Error saving presentation: {e}")
+            self.logger.error("❌ Error saving presentation: %s", e)
             return False
 
     def generate_ppt(
@@ -348,31 +664,121 @@ class PPTGenerator:
         # Initialize the client and agents
         if not self.initialize_client():
             return False
-            
-        time.sleep(0.5)  # Small delay for API stability
-        
-        if not self.initialize_ppt_agent():
-            return False
-            
-        if not self.initialize_code_agent():
-            return False
-            
-        if not self.create_thread():
-            return False
 
-        # Run the PPT generation agent
-        ppt_messages = self.run_ppt_generation(input_file, code_dir)
-        
-        # Run the code execution agent
-        code_messages = self.run_code_execution(ppt_messages)
+        # The two agent initializations and the thread creation hit
+        # independent endpoints, so issue them together instead of
+        # paying three sequential round-trips
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            ppt_future = executor.submit(self.initialize_ppt_agent)
+            code_future = executor.submit(self.initialize_code_agent)
+            thread_future = executor.submit(self.create_thread)
+            if not (ppt_future.result() and code_future.result() and thread_future.result()):
+                return False
+
+        # Run the PPT generation agent, kicking off code execution on a
+        # worker as soon as the first complete python block streams in,
+        # so the two agent runs overlap
+        exec_future = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            def _start_execution(code):
+                nonlocal exec_future
+                exec_future = executor.submit(self.run_code_execution, code)
+
+            ppt_text = self.run_ppt_generation(input_file, code_dir, on_code_block=_start_execution)
+
+            if exec_future is not None:
+                code_messages = exec_future.result()
+            else:
+                # No code block surfaced mid-stream; fall back to sending
+                # the full response text
+                code_messages = self.run_code_execution(ppt_text)
         
         # Save the presentation
         return self.save_presentation(code_messages, output_file, output_dir)
 
+    def generate_ppt_batch(self, jobs: List[Dict[str, Any]], concurrency: int = 8) -> List[bool]:
+        """
+        Generate presentations for many documents with one setup pass.
+
+        The client and both agents are initialized once; each job then
+        runs its own thread/upload/run chain on a worker, so the per-call
+        initialization overhead is paid once instead of per document and
+        the jobs' I/O waits overlap.
+
+        Args:
+            jobs: List of dicts with input_file, output_file and
+                optionally code_dir and output_dir keys, mirroring the
+                generate_ppt arguments
+            concurrency: Maximum number of jobs in flight at once
+
+        Returns:
+            list[bool]: Per-job success flags, in input order
+        """
+        if not jobs:
+            return []
+        if not self.initialize_client():
+            return [False] * len(jobs)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            ppt_future = executor.submit(self.initialize_ppt_agent)
+            code_future = executor.submit(self.initialize_code_agent)
+            if not (ppt_future.result() and code_future.result()):
+                return [False] * len(jobs)
+
+        def _run_job(job):
+            # Threads are per-conversation, so every job gets its own
+            thread = agents_call(self.project_client.agents.create_thread)
+            ppt_text = self.run_ppt_generation(
+                job['input_file'],
+                job.get('code_dir'),
+                thread_id=thread.id
+            )
+            code_messages = self.run_code_execution(ppt_text)
+            return self.save_presentation(code_messages, job['output_file'], job.get('output_dir'))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(jobs))) as executor:
+            futures = [executor.submit(_run_job, job) for job in jobs]
+            # One failed job must not sink the batch; record it and go on
+            for job, future in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    self.logger.error("❌ Batch job failed for %s: %s", job.get('input_file'), e)
+                    results.append(False)
+        return results
+
+    async def generate_ppt_async(
+        self,
+        input_file: str,
+        output_file: str,
+        code_dir: Optional[str] = None,
+        output_dir: Optional[str] = None
+    ) -> bool:
+        """
+        Awaitable wrapper around generate_ppt for event-loop callers.
+
+        The pipeline itself stays on the synchronous SDK — the shared
+        throttle and the streamed-run pipelining are thread-based — so
+        this offloads the whole run to a worker thread, leaving the
+        caller's event loop free to serve other work meanwhile.
+        """
+        return await asyncio.to_thread(
+            self.generate_ppt, input_file, output_file, code_dir, output_dir
+        )
+
+    async def generate_ppt_batch_async(self, jobs: List[Dict[str, Any]], concurrency: int = 8) -> List[bool]:
+        """
+        Awaitable wrapper around generate_ppt_batch.
+
+        Job concurrency is still handled by the batch method's bounded
+        worker pool; only the blocking wait is moved off the event loop.
+        """
+        return await asyncio.to_thread(self.generate_ppt_batch, jobs, concurrency)
+
     def run(self):
-        input_file = os.environ['OUTPUT_DIR'] + '/' + os.environ['PPT_INPUT_PATH']
-        output_file = os.environ['OUTPUT_DIR'] + '/' + os.environ['PPT_OUTPUT_PATH']
-        output_dir = os.environ['OUTPUT_DIR'] 
+        input_file = os.path.join(self.cfg.output_dir, self.cfg.ppt_input_path)
+        output_file = os.path.join(self.cfg.output_dir, self.cfg.ppt_output_path)
+        output_dir = self.cfg.output_dir
         code_dir = None
         
         # Generate the presentation
@@ -385,8 +791,8 @@ if __name__ == "__main__":
     # Create an instance of the PPTGenerator
     generator = PPTGenerator()
 
-    input_file = os.environ['OUTPUT_DIR'] + r'\\' + os.environ['PPT_INPUT_PATH']
-    output_file = os.environ['OUTPUT_DIR'] + r'\\' + os.environ['PPT_OUTPUT_PATH']
+    input_file = os.path.join(generator.cfg.output_dir, generator.cfg.ppt_input_path)
+    output_file = os.path.join(generator.cfg.output_dir, generator.cfg.ppt_output_path)
     code_dir = None
     
     # Generate the presentation
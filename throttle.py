@@ -0,0 +1,71 @@
+## Token-bucket throttle and bounded 429 retry shared by all Azure
+## agent calls in the process, so transient rate-limit peaks turn into
+## short waits instead of failed pipelines
+import os
+import random
+import threading
+import time
+
+## Requests per second allowed against the agents API
+_RPS = float(os.environ.get("CODEASSIST_RPS", "2"))
+
+_MAX_ATTEMPTS = 5
+_MAX_WAIT = 30.0
+
+class RateLimiter:
+    """A simple thread-safe token bucket."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, refilling at `rate` per second."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+## One bucket for the whole process; concurrent agent pipelines share it
+_limiter = RateLimiter(_RPS)
+
+def _retry_wait(error, delay):
+    """Honor the server's Retry-After when present, else backoff + jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), _MAX_WAIT)
+        except ValueError:
+            pass
+    return min(delay + random.uniform(0, delay), _MAX_WAIT)
+
+def agents_call(func, *args, **kwargs):
+    """
+    Invoke an SDK call through the shared throttle, retrying bounded
+    times on 429 responses.
+    """
+    ## Imported here so importing this module stays azure-free
+    from azure.core.exceptions import HttpResponseError
+
+    delay = 1.0
+    for attempt in range(_MAX_ATTEMPTS):
+        _limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except HttpResponseError as e:
+            if getattr(e, "status_code", None) != 429 or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            wait = _retry_wait(e, delay)
+            print(f"⚠️ Rate limited (429); retrying in {wait:.1f}s")
+            time.sleep(wait)
+            delay = min(delay * 2, _MAX_WAIT)
@@ -0,0 +1,67 @@
+## Cache of uploaded file ids keyed by content hash, so re-running a
+## pipeline on an unchanged document skips the upload round-trip
+import hashlib
+import json
+import os
+import threading
+
+## Lives next to the agent id cache
+_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".codeassist", "uploads.json")
+
+## In-process cache keyed by content digest
+_file_ids = None
+
+## Parallel uploads cache ids from several worker threads at once; the
+## lock serializes each read-modify-write cycle
+_lock = threading.Lock()
+
+def file_sha256(path):
+    """Hash a file's contents in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _load():
+    global _file_ids
+    if _file_ids is None:
+        try:
+            with open(_CACHE_PATH, "r", encoding="utf-8") as f:
+                _file_ids = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            _file_ids = {}
+    return _file_ids
+
+def _write(cache):
+    ## Write atomically so concurrent runs never see a torn file
+    os.makedirs(os.path.dirname(_CACHE_PATH), exist_ok=True)
+    tmp_path = _CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, _CACHE_PATH)
+
+def get_cached_file_id(digest):
+    """Return the uploaded file id for this content digest, or None."""
+    with _lock:
+        return _load().get(digest)
+
+def cache_file_id(digest, file_id):
+    """Remember an uploaded file id in memory and on disk."""
+    with _lock:
+        cache = _load()
+        cache[digest] = file_id
+        try:
+            _write(cache)
+        except OSError as e:
+            print(f"⚠️ Could not persist upload cache: {e}")
+
+def drop_cached_file_id(digest):
+    """Forget a cached id that no longer exists server-side."""
+    with _lock:
+        cache = _load()
+        if cache.pop(digest, None) is not None:
+            try:
+                _write(cache)
+            except OSError:
+                pass